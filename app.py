@@ -1,15 +1,18 @@
 # app.py
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
+import numpy as np
 from datetime import datetime, timezone
-import json
 import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils import (
-    fetch_stock_data, calculate_score, run_backtest,
-    load_tickers, log_error, ensure_data_file
+    fetch_stock_data, fetch_latest_prices, fundamental_scores, technical_score, run_backtests,
+    load_tickers, log_error, ensure_data_file, read_json,
+    migrate_json_to_parquet, load_parquet_store, HIST_FILE, TECHNICAL_SCORE_MAX
 )
-import time
 
 IST = timezone.utc  # Adjust manually in display
 
@@ -21,41 +24,158 @@ ensure_data_file()
 DATA_FILE = 'stock_data.json'
 WATCHLIST_FILE = 'watchlist.json'
 PORTFOLIO_FILE = 'paper_portfolio.json'
+STATE_DB = 'state.db'
 
 # Load data
-@st.cache_data(show_spinner=False)
-def load_stock_data():
-    if not os.path.exists(DATA_FILE):
-        return {}
+# Parquet reads fast enough for a cold start, so only the current version is kept, in memory
+@st.cache_data(max_entries=1, show_spinner=False)
+def load_stock_data(version):
+    """Load (hist_df, fund_df); `version` is the data file mtime so a refresh invalidates the cache"""
     try:
-        with open(DATA_FILE, 'r') as f:
-            data = json.load(f)
-        return data.get('stocks', {})
+        if not os.path.exists(HIST_FILE):
+            migrate_json_to_parquet()
+        return load_parquet_store()
     except Exception as e:
-        log_error("N/A", f"Failed to load stock_data.json: {e}")
-        return {}
+        log_error("N/A", f"Failed to load Parquet stock data: {e}")
+        return pd.DataFrame(), pd.DataFrame()
+
+@st.cache_resource(max_entries=4096, show_spinner=False)
+def hist_arrays(ticker, version, _hist_df):
+    """One ticker's history as column arrays, built once per data version and shared read-only"""
+    df = _hist_df.loc[ticker]
+    return {"Date": df.index.to_numpy(), **{col: df[col].to_numpy() for col in df.columns}}
+
+@st.cache_resource(show_spinner=False)
+def fund_records(version, _fund_df):
+    """Fundamentals as {ticker: dict} with NaN as None, built once per data version and shared read-only"""
+    return _fund_df.astype(object).where(_fund_df.notna(), None).to_dict('index')
+
+def get_stock(ticker):
+    """Assemble the {'hist', 'fundamentals'} record utils expects for one ticker"""
+    return {
+        "hist": hist_arrays(ticker, data_version, hist_df),
+        "fundamentals": fund_records(data_version, fund_df)[ticker]
+    }
 
-def load_watchlist():
+@st.cache_data(show_spinner=False)
+def build_candlestick(ticker, version, _hist_df):
+    """Candlestick figure for one ticker; `version` ties the cache to the loaded data"""
+    import plotly.graph_objects as go
+    df = _hist_df.loc[ticker]
+    fig = go.Figure(data=[go.Candlestick(
+        x=df.index,
+        open=df['Open'],
+        high=df['High'],
+        low=df['Low'],
+        close=df['Close']
+    )])
+    fig.update_layout(title=f"{ticker} - Candlestick Chart", xaxis_title="Date", yaxis_title="Price")
+    return fig
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def technical_scores(version):
+    """{ticker: technical score} shared by all sessions; a new data version starts an empty dict"""
+    return {}
+
+@st.cache_data(ttl=60, show_spinner=False)
+def latest_prices(tickers):
+    """Batched live closes, reused across reruns within a minute"""
+    return fetch_latest_prices(list(tickers))
+
+def stored_price(ticker, default=None):
+    """Price saved at the last refresh, or `default` for unknown tickers"""
+    if ticker in fund_df.index and pd.notna(fund_df.at[ticker, 'price']):
+        return float(fund_df.at[ticker, 'price'])
+    return default
+
+def read_legacy_state():
+    """Watchlist and portfolio from the JSON files used before state.db"""
     try:
-        with open(WATCHLIST_FILE, 'r') as f:
-            return json.load(f)
+        watchlist = read_json(WATCHLIST_FILE)
     except:
-        return []
-
-def save_watchlist(watchlist):
-    with open(WATCHLIST_FILE, 'w') as f:
-        json.dump(watchlist, f)
-
-def load_portfolio():
+        watchlist = []
     try:
-        with open(PORTFOLIO_FILE, 'r') as f:
-            return json.load(f)
+        portfolio = read_json(PORTFOLIO_FILE)
     except:
-        return {"cash": 100000.0, "positions": []}
+        portfolio = {"cash": 100000.0, "positions": {}}
+    # Older files stored positions as a list of {"ticker", "shares", "avg_price"}
+    if isinstance(portfolio['positions'], list):
+        portfolio['positions'] = {
+            p['ticker']: {"shares": p['shares'], "avg_price": p['avg_price']}
+            for p in portfolio['positions']
+        }
+    return watchlist, portfolio
+
+@st.cache_resource
+def get_state_db():
+    """Shared SQLite connection for the watchlist and paper portfolio"""
+    conn = sqlite3.connect(STATE_DB, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS watchlist (ticker TEXT PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS positions (ticker TEXT PRIMARY KEY, shares INTEGER, avg_price REAL);
+        CREATE TABLE IF NOT EXISTS cash (id INTEGER PRIMARY KEY CHECK (id = 0), v REAL);
+    """)
+    if conn.execute("SELECT COUNT(*) FROM cash").fetchone()[0] == 0:
+        watchlist, portfolio = read_legacy_state()
+        conn.execute("BEGIN")
+        conn.executemany("INSERT OR IGNORE INTO watchlist VALUES (?)", [(t,) for t in watchlist])
+        conn.executemany(
+            "INSERT OR REPLACE INTO positions VALUES (?, ?, ?)",
+            [(t, p['shares'], p['avg_price']) for t, p in portfolio['positions'].items()]
+        )
+        conn.execute("INSERT INTO cash VALUES (0, ?)", (portfolio['cash'],))
+        conn.execute("COMMIT")
+    return conn
+
+@st.cache_resource
+def state_db_lock():
+    """Lock shared by every session thread around the shared connection"""
+    return threading.Lock()
+
+@contextmanager
+def state_db():
+    """The shared connection, held exclusively so one session's transaction never interleaves with another's"""
+    with state_db_lock():
+        yield get_state_db()
+
+def load_watchlist():
+    with state_db() as conn:
+        return [row[0] for row in conn.execute("SELECT ticker FROM watchlist ORDER BY rowid")]
+
+def add_to_watchlist(ticker):
+    """Insert one row; returns False when the ticker was already there"""
+    with state_db() as conn:
+        return conn.execute("INSERT OR IGNORE INTO watchlist VALUES (?)", (ticker,)).rowcount > 0
 
-def save_portfolio(portfolio):
-    with open(PORTFOLIO_FILE, 'w') as f:
-        json.dump(portfolio, f, indent=2)
+def remove_from_watchlist(ticker):
+    with state_db() as conn:
+        conn.execute("DELETE FROM watchlist WHERE ticker = ?", (ticker,))
+
+def load_portfolio():
+    with state_db() as conn:
+        return {
+            "cash": conn.execute("SELECT v FROM cash WHERE id = 0").fetchone()[0],
+            "positions": {
+                t: {"shares": shares, "avg_price": avg_price}
+                for t, shares, avg_price in conn.execute("SELECT ticker, shares, avg_price FROM positions ORDER BY rowid")
+            }
+        }
+
+def save_trade(cash, ticker, pos):
+    """Persist the new cash balance and one updated position (None closes it) atomically"""
+    with state_db() as conn:
+        conn.execute("BEGIN")
+        try:
+            conn.execute("UPDATE cash SET v = ? WHERE id = 0", (cash,))
+            if pos:
+                conn.execute("INSERT OR REPLACE INTO positions VALUES (?, ?, ?)", (ticker, pos['shares'], pos['avg_price']))
+            else:
+                conn.execute("DELETE FROM positions WHERE ticker = ?", (ticker,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
 
 # Sidebar
 st.sidebar.title("CAN SLIM Screener")
@@ -73,15 +193,13 @@ st.sidebar.subheader("Watchlist")
 watchlist = load_watchlist()
 add_ticker = st.sidebar.text_input("Add Ticker (e.g., AAPL)")
 if st.sidebar.button("Add to Watchlist") and add_ticker:
-    if add_ticker not in watchlist:
-        watchlist.append(add_ticker)
-        save_watchlist(watchlist)
+    # The ticker primary key de-duplicates, so a repeat add writes nothing and skips the rerun
+    if add_to_watchlist(add_ticker):
         st.rerun()
 
 for ticker in watchlist:
     if st.sidebar.button(f"❌ {ticker}"):
-        watchlist.remove(ticker)
-        save_watchlist(watchlist)
+        remove_from_watchlist(ticker)
         st.rerun()
 
 # Filters
@@ -97,44 +215,46 @@ sectors = st.sidebar.multiselect(
     default=["Technology"]
 )
 momentum = st.sidebar.selectbox("Momentum", ["Positive", "Negative", "All"])
+min_score = st.sidebar.slider("Minimum Total Score", 0, 160, 0, step=5)
 
 # Max tickers for performance
 max_tickers = st.sidebar.number_input("Max Tickers to Screen", 50, 750, 100)
 
 # Load data
-data = load_stock_data()
-if not data:
+data_version = os.path.getmtime(DATA_FILE) if os.path.exists(DATA_FILE) else 0.0
+hist_df, fund_df = load_stock_data(data_version)
+if fund_df.empty:
     st.warning("No stock data available. Click 'Refresh' to fetch data.")
     st.stop()
 
 # Apply watchlist filter
 use_watchlist = st.sidebar.checkbox("Use Watchlist Only", value=False)
-tickers_to_use = watchlist if use_watchlist else list(data.keys())
-tickers_to_use = [t for t in tickers_to_use if t in data]
+# Index membership is a hash lookup; the full universe needs no per-ticker check at all
+tickers_to_use = [t for t in watchlist if t in fund_df.index] if use_watchlist else fund_df.index.tolist()
 
 # Filter by market cap and sector
-filtered_tickers = []
-for ticker in tickers_to_use[:max_tickers]:
-    d = data[ticker]
-    fund = d['fundamentals']
-    cap = fund.get("market_cap")
-    sec = fund.get("sector", "")
-
-    include = False
-    if "Large (> $10B)" in market_caps and cap and cap > 10e9:
-        include = True
-    if "Mid ($2-10B)" in market_caps and cap and 2e9 < cap <= 10e9:
-        include = True
-    if "Small (< $2B)" in market_caps and cap and cap < 2e9:
-        include = True
-
-    if not include:
-        continue
-
-    if sec not in sectors:
-        continue
-
-    filtered_tickers.append(ticker)
+screen_df = fund_df.reindex(index=tickers_to_use[:max_tickers], columns=['market_cap', 'sector'])
+cap = screen_df['market_cap'].to_numpy(dtype='float64', na_value=np.nan)
+
+cap_mask = np.zeros(len(cap), dtype=bool)
+if "Large (> $10B)" in market_caps:
+    cap_mask |= cap > 10e9
+if "Mid ($2-10B)" in market_caps:
+    cap_mask |= (cap > 2e9) & (cap <= 10e9)
+if "Small (< $2B)" in market_caps:
+    cap_mask |= (cap > 0) & (cap < 2e9)
+
+sector_mask = screen_df['sector'].isin(sectors).to_numpy()
+filtered_tickers = screen_df.index.to_numpy()[cap_mask & sector_mask]
+# Fundamentals are cheap to score, so drop tickers that cannot reach min_score
+# even with a perfect technical score before running the indicator kernel on them;
+# the chart and backtest pickers still offer every ticker that passed the filters
+score_candidates = filtered_tickers
+if min_score:
+    ceiling = fundamental_scores(fund_df.loc[filtered_tickers]).to_numpy() + TECHNICAL_SCORE_MAX
+    score_candidates = filtered_tickers[ceiling >= min_score]
+filtered_tickers = filtered_tickers.tolist()
+score_candidates = score_candidates.tolist()
 
 # Scoring with progress bar
 st.subheader("Screening Results")
@@ -142,79 +262,95 @@ if not filtered_tickers:
     st.warning("No tickers match filters.")
     st.stop()
 
-progress_bar = st.progress(0)
-status_text = st.empty()
-results = []
-
-for idx, ticker in enumerate(filtered_tickers):
-    try:
-        d = data[ticker]
-        total, f, t = calculate_score(d)
-        momentum_ok = True
-        if momentum == "Positive" and t < 40:
-            continue
-        elif momentum == "Negative" and t >= 40:
-            continue
-
-        results.append({
-            "Ticker": f"[{ticker}](https://www.tradingview.com/symbols/{ticker.replace('.NS', '')}/)",
-            "Total Score": total,
-            "Fundamental Score": f,
-            "Technical Score": t,
-            "EPS Growth": f"{d['fundamentals'].get('eps_growth', 0):.1%}" if d['fundamentals'].get('eps_growth') else "N/A",
-            "ROE": f"{d['fundamentals'].get('roe', 0):.1%}" if d['fundamentals'].get('roe') else "N/A",
-            "Price": f"${d['fundamentals'].get('price', 0):.2f}",
-            "Sector": d['fundamentals'].get('sector', 'Unknown')
-        })
-    except Exception as e:
-        log_error(ticker, f"Scoring failed: {e}")
-    progress_bar.progress((idx + 1) / len(filtered_tickers))
-    status_text.text(f"Processing: {100*(idx+1)/len(filtered_tickers):.1f}%")
-
-progress_bar.empty()
-status_text.empty()
-
-# Paginate results
-results_df = pd.DataFrame(results)
-results_df = results_df.sort_values("Total Score", ascending=False)
-
-items_per_page = 50
-total_pages = (len(results_df) // items_per_page) + 1
-page = st.selectbox("Page", range(1, total_pages + 1)) - 1
-start = page * items_per_page
-end = start + items_per_page
-
-st.markdown(
-    results_df.iloc[start:end].to_html(escape=False, index=False),
-    unsafe_allow_html=True
+# Technical scores only change when the data does, so every session shares them until the next refresh
+score_cache = technical_scores(data_version)
+misses = [t for t in score_candidates if t not in score_cache]
+
+if misses:
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    with ThreadPoolExecutor(max_workers=min(32, len(misses))) as executor:
+        futures = {executor.submit(technical_score, get_stock(t)): t for t in misses}
+        for done, fut in enumerate(as_completed(futures), start=1):
+            ticker = futures[fut]
+            try:
+                score_cache[ticker] = fut.result()
+            except Exception as e:
+                log_error(ticker, f"Scoring failed: {e}")
+            finally:
+                progress_bar.progress(done / len(misses))
+                status_text.text(f"Processing: {100*done/len(misses):.1f}%")
+    progress_bar.empty()
+    status_text.empty()
+
+# Score every cached ticker in one vectorised pass; None (too little history) scores zero
+# An explicit object index keeps Ticker a string column even when min_score prunes every candidate
+scored_tickers = pd.Index([t for t in score_candidates if t in score_cache], dtype=object)
+t_scores = pd.Series([score_cache[t] for t in scored_tickers], index=scored_tickers, dtype='float64')
+scorable = t_scores.notna().to_numpy()
+t_scores = t_scores.fillna(0).astype(int)
+if momentum == "Positive":
+    keep = (t_scores >= 40).to_numpy()
+elif momentum == "Negative":
+    keep = (t_scores < 40).to_numpy()
+else:
+    keep = np.ones(len(t_scores), dtype=bool)
+t_scores, scorable = t_scores[keep], scorable[keep]
+
+scored = fund_df.loc[t_scores.index, ['eps_growth', 'roe', 'price', 'sector']]
+f_scores = np.where(scorable, fundamental_scores(fund_df.loc[t_scores.index]), 0)
+results_df = pd.DataFrame({
+    "Ticker": t_scores.index,
+    "Total Score": f_scores + t_scores.to_numpy(),
+    "Fundamental Score": f_scores,
+    "Technical Score": t_scores.to_numpy(),
+    "EPS Growth": scored['eps_growth'].to_numpy(dtype='float64'),
+    "ROE": scored['roe'].to_numpy(dtype='float64'),
+    "Price": scored['price'].to_numpy(dtype='float64'),
+    "Sector": scored['sector'].to_numpy()
+})
+results_df = results_df[results_df["Total Score"] >= min_score].sort_values("Total Score", ascending=False)
+
+# st.dataframe virtualises rows client-side, so the full result set is sent at once
+display_df = results_df.copy()
+# Ticker keeps the full symbol Buy/Sell expect; the TradingView link gets its own column
+display_df.insert(1, "Chart", "https://www.tradingview.com/symbols/" + display_df["Ticker"].str.replace(".NS", "", regex=False) + "/")
+display_df[["EPS Growth", "ROE"]] *= 100
+st.dataframe(
+    display_df,
+    column_config={
+        "Chart": st.column_config.LinkColumn("Chart", display_text="TradingView"),
+        "EPS Growth": st.column_config.NumberColumn("EPS Growth", format="%.1f%%"),
+        "ROE": st.column_config.NumberColumn("ROE", format="%.1f%%"),
+        "Price": st.column_config.NumberColumn("Price", format="$%.2f")
+    },
+    hide_index=True,
+    use_container_width=True
 )
 
 # Select stock for chart
 st.subheader("Candlestick Chart")
 selected_ticker = st.selectbox("Select Ticker", filtered_tickers)
 if selected_ticker:
-    stock_data = data[selected_ticker]
-    df = pd.DataFrame(stock_data['hist'])
-    df['Date'] = pd.to_datetime(df['Date'])
-
-    fig = go.Figure(data=[go.Candlestick(
-        x=df['Date'],
-        open=df['Open'],
-        high=df['High'],
-        low=df['Low'],
-        close=df['Close']
-    )])
-    fig.update_layout(title=f"{selected_ticker} - Candlestick Chart", xaxis_title="Date", yaxis_title="Price")
+    fig = build_candlestick(selected_ticker, data_version, hist_df)
     st.plotly_chart(fig, use_container_width=True)
 
-    # Backtesting
-    if st.button("Run Backtest"):
+    # Backtesting: tickers are backtested in-process with the compiled _canslim_equity loop
+    backtest_tickers = st.multiselect("Backtest Tickers", filtered_tickers, default=[selected_ticker])
+    if st.button("Run Backtest") and backtest_tickers:
         with st.spinner("Running backtest..."):
-            metrics = run_backtest(selected_ticker, stock_data)
-            if metrics:
-                st.write(f"**CAGR:** {metrics['CAGR']}%")
-                st.write(f"**Sharpe Ratio:** {metrics['Sharpe Ratio']}")
-                st.write(f"**Max Drawdown:** {metrics['Max Drawdown']}%")
+            all_metrics = run_backtests({t: get_stock(t) for t in backtest_tickers})
+            if all_metrics:
+                metrics_df = pd.DataFrame.from_dict(all_metrics, orient='index')
+                # Every ticker starts with the same cash, so the portfolio view is an equal-weighted mean
+                # Sharpe is None for tickers that never traded; coerced to NaN, the mean skips them
+                metrics = metrics_df.apply(pd.to_numeric, errors='coerce').mean()
+                sharpe = "N/A" if pd.isna(metrics['Sharpe Ratio']) else f"{metrics['Sharpe Ratio']:.2f}"
+                st.write(f"**CAGR:** {metrics['CAGR']:.2f}%")
+                st.write(f"**Sharpe Ratio:** {sharpe}")
+                st.write(f"**Max Drawdown:** {metrics['Max Drawdown']:.2f}%")
+                if len(metrics_df) > 1:
+                    st.dataframe(metrics_df, use_container_width=True)
             else:
                 st.error("Backtest failed.")
 
@@ -232,24 +368,18 @@ with col1:
     buy_ticker = st.text_input("Buy Ticker")
     buy_shares = st.number_input("Shares", 1, 1000, 1)
     if st.button("Buy"):
-        price = data.get(buy_ticker, {}).get('fundamentals', {}).get('price')
+        price = stored_price(buy_ticker)
         if price and price * buy_shares <= cash:
             cost = price * buy_shares
             portfolio['cash'] -= cost
-            found = False
-            for p in positions:
-                if p['ticker'] == buy_ticker:
-                    p['shares'] += buy_shares
-                    p['avg_price'] = ((p['avg_price'] * (p['shares'] - buy_shares)) + cost) / p['shares']
-                    found = True
-            if not found:
-                positions.append({
-                    "ticker": buy_ticker,
-                    "shares": buy_shares,
-                    "avg_price": price
-                })
-            portfolio['positions'] = positions
-            save_portfolio(portfolio)
+            pos = positions.get(buy_ticker)
+            if pos:
+                new_shares = pos['shares'] + buy_shares
+                pos['avg_price'] = (pos['avg_price'] * pos['shares'] + cost) / new_shares
+                pos['shares'] = new_shares
+            else:
+                positions[buy_ticker] = {"shares": buy_shares, "avg_price": price}
+            save_trade(portfolio['cash'], buy_ticker, positions[buy_ticker])
             st.success(f"Bought {buy_shares} shares of {buy_ticker}")
             st.rerun()
         else:
@@ -257,20 +387,19 @@ with col1:
 
 with col2:
     if positions:
-        sell_ticker = st.selectbox("Sell Ticker", [p['ticker'] for p in positions])
-        sell_pos = next((p for p in positions if p['ticker'] == sell_ticker), None)
+        sell_ticker = st.selectbox("Sell Ticker", list(positions))
+        sell_pos = positions.get(sell_ticker)
         max_shares = sell_pos['shares'] if sell_pos else 0
         sell_shares = st.number_input("Sell Shares", 1, max_shares, 1)
         if st.button("Sell"):
-            price = data.get(sell_ticker, {}).get('fundamentals', {}).get('price')
+            price = stored_price(sell_ticker)
             if price and sell_pos and sell_shares <= sell_pos['shares']:
                 revenue = price * sell_shares
                 portfolio['cash'] += revenue
                 sell_pos['shares'] -= sell_shares
                 if sell_pos['shares'] == 0:
-                    positions.remove(sell_pos)
-                portfolio['positions'] = positions
-                save_portfolio(portfolio)
+                    del positions[sell_ticker]
+                save_trade(portfolio['cash'], sell_ticker, positions.get(sell_ticker))
                 st.success(f"Sold {sell_shares} shares of {sell_ticker}")
                 st.rerun()
             else:
@@ -278,21 +407,45 @@ with col2:
     else:
         st.write("No positions to sell.")
 
-# Portfolio Table
-if positions:
-    pos_data = []
-    for p in positions:
-        d = data.get(p['ticker'], {})
-        curr_price = d.get('fundamentals', {}).get('price', p['avg_price'])
-        pl = (curr_price - p['avg_price']) * p['shares']
-        pos_data.append({
-            "Ticker": p['ticker'],
-            "Shares": p['shares'],
-            "Avg Price": f"${p['avg_price']:.2f}",
-            "Current Price": f"${curr_price:.2f}",
-            "P&L": f"${pl:.2f}"
-        })
+# Portfolio Table: a fragment so live prices refresh every minute without rerunning the screener
+@st.fragment(run_every=60)
+def portfolio_table(cash, positions):
+    """Positions with live prices, P&L and total value"""
+    if not positions:
+        return
+    # One batched request for all open positions, falling back to stored prices
+    live_prices = latest_prices(tuple(sorted(positions)))
+    pos_df = pd.DataFrame.from_dict(positions, orient='index')
+    stored = fund_df['price'].reindex(pos_df.index).astype('float64')
+    shares = pos_df['shares'].to_numpy()
+    avg_price = pos_df['avg_price'].to_numpy(dtype='float64')
+    curr_price = (
+        pd.Series(live_prices, dtype='float64').reindex(pos_df.index)
+        .fillna(stored)
+        .to_numpy()
+    )
+    curr_price = np.where(np.isnan(curr_price), avg_price, curr_price)
+    # Derived columns are computed as arrays and attached in one assign
+    pos_df = pos_df.assign(
+        curr_price=curr_price,
+        pl=(curr_price - avg_price) * shares
+    )
+    total_value = cash + (curr_price * shares).sum()
+
+    table_df = pos_df.reset_index(names="Ticker").rename(columns={
+        "shares": "Shares", "avg_price": "Avg Price", "curr_price": "Current Price", "pl": "P&L"
+    })
     st.write("### Positions")
-    st.table(pos_data)
-    total_value = sum((data.get(p['ticker'], {}).get('fundamentals', {}).get('price', p['avg_price']) * p['shares'] for p in positions), cash)
+    st.dataframe(
+        table_df,
+        column_config={
+            "Avg Price": st.column_config.NumberColumn("Avg Price", format="$%.2f"),
+            "Current Price": st.column_config.NumberColumn("Current Price", format="$%.2f"),
+            "P&L": st.column_config.NumberColumn("P&L", format="$%.2f")
+        },
+        hide_index=True,
+        use_container_width=True
+    )
     st.write(f"**Total Portfolio Value:** ${total_value:,.2f}")
+
+portfolio_table(cash, positions)
@@ -0,0 +1,54 @@
+"""Screener page checks run through Streamlit's AppTest on a small synthetic store"""
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from utils import write_json, DATA_FILE
+
+def write_store(n_tickers=3, n_bars=300, drift=0.001, vol=0.02):
+    """Legacy stock_data.json with history, which the app migrates to Parquet on first load"""
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range('2023-01-02', periods=n_bars).strftime('%Y-%m-%d')
+    stocks = {}
+    for i in range(n_tickers):
+        close = 100 * np.exp(np.cumsum(rng.normal(drift, vol, n_bars)))
+        stocks[f"T{i}.NS"] = {
+            "hist": [dict(Date=d, Open=c, High=c * 1.01, Low=c * 0.99, Close=c, Volume=1000)
+                     for d, c in zip(dates, close.tolist())],
+            # Fundamental score 40 + 30 + 10 = 80 needs EPS growth over 25%; these stop at 40
+            "fundamentals": {"eps_growth": 0.1, "roe": 0.2, "market_cap": 20e9, "sector": "Technology",
+                             "price": close[-1]}
+        }
+    write_json(DATA_FILE, {"last_fetch": None, "stocks": stocks})
+
+def test_min_score_pruning_every_candidate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_store()
+    at = AppTest.from_file("app.py", default_timeout=60).run()
+    at.sidebar.slider[0].set_value(160).run()
+
+    assert not at.exception
+    assert at.dataframe[0].value.empty
+    # The chart and backtest pickers still offer every ticker that passed the filters
+    assert [s for s in at.selectbox if s.label == "Select Ticker"][0].options == ["T0.NS", "T1.NS", "T2.NS"]
+
+def test_results_show_full_ticker_symbols(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_store()
+    at = AppTest.from_file("app.py", default_timeout=60).run()
+    at.sidebar.selectbox[0].set_value("All").run()
+
+    results = at.dataframe[0].value
+    # Buy/Sell take the symbol exactly as the table shows it
+    assert sorted(results["Ticker"]) == ["T0.NS", "T1.NS", "T2.NS"]
+    assert results["Chart"].str.startswith("https://www.tradingview.com/symbols/T").all()
+
+def test_backtest_without_trades_shows_na_sharpe(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Steadily falling closes never break out, so no ticker trades
+    write_store(drift=-0.005, vol=0.0)
+    at = AppTest.from_file("app.py", default_timeout=60).run()
+    [b for b in at.button if b.label == "Run Backtest"][0].click().run()
+
+    assert not at.exception
+    assert "**Sharpe Ratio:** N/A" in [m.value for m in at.markdown]
@@ -0,0 +1,44 @@
+"""Deterministic checks of the compiled CAN SLIM backtest on hand-built price series"""
+import numpy as np
+
+from utils import _canslim_equity, run_backtest
+
+STOP_MULT = 0.93
+TRAIL_MULT = 0.90
+
+def run_kernel(open_, close, cash=1000.0):
+    """Run the kernel with a breakout on bar 0 only and no commission"""
+    close = np.asarray(close, dtype=np.float64)
+    sma200 = np.zeros(len(close))
+    # A 252-day high only on bar 0, so there is exactly one entry signal
+    high252 = np.full(len(close), np.inf)
+    high252[0] = close[0]
+    return _canslim_equity(np.asarray(open_, dtype=np.float64), close, sma200, high252,
+                           STOP_MULT, TRAIL_MULT, cash, 0.0)
+
+def test_entry_fills_at_next_open():
+    values, trades = run_kernel(open_=[99, 101, 102], close=[100, 100, 103])
+    # Still open at the end: exit bar -1, no exit price
+    assert trades.shape == (1, 4)
+    assert trades[0, :3].tolist() == [1, 101, -1] and np.isnan(trades[0, 3])
+    # No position on the signal bar; one share marked at the close afterwards
+    assert values.tolist() == [1000, 1000 - 101 + 100, 1000 - 101 + 103]
+
+def test_stop_loss_exit():
+    # Bought at 101; the close of 93 is under 101 * 0.93 but above the trailing stop of 90.9
+    values, trades = run_kernel(open_=[99, 101, 95, 92, 90], close=[100, 100, 93, 91, 95])
+    assert trades.tolist() == [[1, 101, 3, 92]]
+    assert values[-1] == 1000 - 101 + 92
+
+def test_trailing_stop_exit():
+    # Bought at 100 and peaked at a 120 close; 107 is under 120 * 0.90 but above the stop loss of 93
+    values, trades = run_kernel(open_=[99, 100, 109, 119, 110, 106, 100],
+                                close=[100, 110, 120, 115, 107, 104, 98])
+    assert trades.tolist() == [[1, 100, 5, 106]]
+    assert values[-1] == 1000 - 100 + 106
+
+def test_sharpe_is_none_without_trades():
+    # A steadily falling series never closes at a new high, so no trade fires
+    close = np.linspace(200, 100, 300)
+    metrics = run_backtest("TEST", {'hist': {'Open': close, 'Close': close}})
+    assert metrics == {'CAGR': 0.0, 'Sharpe Ratio': None, 'Max Drawdown': 0.0}
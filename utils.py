@@ -1,34 +1,91 @@
 # utils.py
 import yfinance as yf
+from yfinance.exceptions import YFTickerMissingError
+import requests
 import pandas as pd
 import numpy as np
-import pandas_ta as ta
 import json
 import time
 import logging
+import logging.handlers
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-import backtrader as bt
 import os
+from _njit import njit
+
+try:
+    import orjson
+except ImportError:  # Fall back to the stdlib parser
+    orjson = None
 
 IST = timezone.utc  # We'll adjust to IST manually if needed
 DATA_FILE = 'stock_data.json'
+HIST_FILE = 'hist.parquet'
+FUNDAMENTALS_FILE = 'fundamentals.parquet'
 ERROR_LOG = 'errors.log'
-
-# Configure logging
-logging.basicConfig(filename=ERROR_LOG, level=logging.ERROR,
-                    format='%(asctime)s - %(levelname)s - %(message)s')
+RATE_LIMIT_INTERVAL = 0.1  # Minimum seconds between Yahoo requests
+FETCH_CONCURRENCY = 16  # Tickers fetched in flight at once
+TECHNICAL_SCORE_MAX = 80  # Four 20-point checks in technical_score
+STRATEGY_PARAMS = {'stop_loss_percent': 0.07, 'trail_percent': 0.10}
+BACKTEST_CASH = 100000.0
+BACKTEST_COMMISSION = 0.001  # Fraction of traded value
+INFO_CACHE_DIR = os.path.join('.cache', 'info')  # Trimmed per-ticker .info responses
+INFO_TTL = 7 * 24 * 3600  # Fundamentals move weekly at most; prices come from the bars
+INFO_FIELDS = ('earningsQuarterlyGrowth', 'returnOnEquity', 'marketCap', 'sector',
+               'trailingPE', 'fiftyTwoWeekHigh', 'twoHundredDayAverage')
+MISSING_CACHE_DIR = os.path.join('.cache', 'missing')  # Sentinels for tickers Yahoo has no data for
+MISSING_TTL = 24 * 3600
+FETCH_RETRIES = 4
+RETRY_BASE_DELAY = 1.0  # Seconds before the first retry; doubles on each attempt
+# Substrings of the per-ticker error reprs yf.download records that mean "try again later";
+# a rate-limited chart request surfaces as a non-JSON body or a 429 status_code
+TRANSIENT_DOWNLOAD_ERRORS = ('Too Many Requests', 'status_code = 429', 'status_code = 5',
+                             'Expecting value', 'Timeout', 'ConnectionError')
+
+# Configure logging: one long-lived rotating handler instead of an open() per error
+logger = logging.getLogger('canslim')
+if not logger.handlers:
+    _handler = logging.handlers.RotatingFileHandler(ERROR_LOG, maxBytes=5_000_000, backupCount=3)
+    _handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.ERROR)
 
 def log_error(ticker: str, message: str):
     """Log error with timestamp and ticker"""
-    logging.error(f"{ticker}: {message}")
-    with open(ERROR_LOG, 'a') as f:
-        f.write(f"{datetime.now(IST)}: {ticker} - {message}\n")
+    logger.error("%s: %s", ticker, message)
+
+def read_json(path):
+    """Parse a JSON file, using orjson when it is installed"""
+    if orjson:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _json_default(obj):
+    """Fallback for values JSON has no type for: numpy scalars/arrays become Python values, the rest strings"""
+    return obj.tolist() if hasattr(obj, 'tolist') else str(obj)
+
+def write_json(path, obj):
+    """Serialize obj to a compact JSON file, using orjson when it is installed
+
+    Writes go to a temp file that replaces `path` atomically, so readers never see a partial file.
+    """
+    tmp = f"{path}.tmp"
+    if orjson:
+        with open(tmp, 'wb') as f:
+            f.write(orjson.dumps(obj, default=_json_default,
+                                 option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC))
+    else:
+        with open(tmp, 'w') as f:
+            json.dump(obj, f, default=_json_default)
+    os.replace(tmp, path)
 
 def ensure_data_file():
     """Ensure stock_data.json exists with correct structure"""
     if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'w') as f:
-            json.dump({"last_fetch": None, "stocks": {}}, f)
+        write_json(DATA_FILE, {"last_fetch": None, "stocks": {}})
         print("Initialized stock_data.json")
 
 def load_tickers():
@@ -41,201 +98,549 @@ def load_tickers():
         log_error("N/A", f"Failed to load tickers.txt: {e}")
         return []
 
-def fetch_single_stock(ticker):
-    """Fetch historical and fundamental data for a single ticker"""
+_last_request = 0.0
+_rate_lock = threading.Lock()
+
+def wait_for_rate_limit():
+    """Sleep only as long as needed to keep Yahoo requests RATE_LIMIT_INTERVAL apart"""
+    global _last_request
+    with _rate_lock:
+        wait = _last_request + RATE_LIMIT_INTERVAL - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _last_request = time.monotonic()
+
+def is_transient(exc):
+    """Rate limits, server errors and dropped connections are worth retrying"""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout)) or "Too Many Requests" in str(exc)
+
+def is_missing(exc):
+    """Delisted or unknown tickers: retrying them before MISSING_TTL is wasted"""
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code == 404
+    return isinstance(exc, YFTickerMissingError)
+
+def with_retries(fn, *args, **kwargs):
+    """Call a rate-limited Yahoo request, backing off exponentially on transient failures"""
+    for attempt in range(FETCH_RETRIES):
+        wait_for_rate_limit()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == FETCH_RETRIES - 1 or not is_transient(e):
+                raise
+            time.sleep(RETRY_BASE_DELAY * 2 ** attempt)
+
+# yf.download reports failures through the module-global yf.shared._ERRORS, so downloads run one at a time
+_download_lock = threading.Lock()
+
+def download_frames(tickers, **kwargs):
+    """yf.download as ({ticker: frame}, throttled), re-requesting tickers that failed transiently
+
+    yf.download never raises for a ticker: it records the error's repr in yf.shared._ERRORS
+    and returns an empty frame. Tickers still failing transiently after FETCH_RETRIES
+    come back in `throttled`, so callers can back off instead of retrying them one by one.
+    """
+    frames = {}
+    pending = list(tickers)
+    for attempt in range(FETCH_RETRIES):
+        wait_for_rate_limit()
+        with _download_lock:
+            df = yf.download(pending, **kwargs)
+            errors = {t: yf.shared._ERRORS.get(t.upper()) for t in pending}
+        throttled = []
+        for ticker in pending:
+            err = errors[ticker]
+            if err is None:
+                try:
+                    frames[ticker] = ticker_frame(df, ticker)
+                except KeyError:
+                    pass
+            elif any(marker in err for marker in TRANSIENT_DOWNLOAD_ERRORS):
+                throttled.append(ticker)
+            elif 'possibly delisted' in err:
+                mark_missing(ticker)
+        if not throttled:
+            break
+        pending = throttled
+        if attempt < FETCH_RETRIES - 1:
+            time.sleep(RETRY_BASE_DELAY * 2 ** attempt)
+    return frames, throttled
+
+def mark_missing(ticker):
+    """Record that Yahoo has no data for a ticker, so refreshes skip it for MISSING_TTL"""
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period="2y")
-        if hist.empty:
-            log_error(ticker, "Empty history from yfinance")
-            return None
+        os.makedirs(MISSING_CACHE_DIR, exist_ok=True)
+        with open(os.path.join(MISSING_CACHE_DIR, ticker), 'w'):
+            pass
+    except OSError as e:
+        log_error(ticker, f"Failed to record missing ticker: {e}")
+
+def known_missing(ticker):
+    """Whether a ticker was marked missing within the last MISSING_TTL"""
+    try:
+        return time.time() - os.path.getmtime(os.path.join(MISSING_CACHE_DIR, ticker)) < MISSING_TTL
+    except OSError:
+        return False
 
-        # Convert to list of dicts for JSON serialization
-        hist.reset_index(inplace=True)
-        hist['Date'] = hist['Date'].dt.strftime('%Y-%m-%d')
-        hist_data = hist[['Date', 'Open', 'High', 'Low', 'Close', 'Volume']].to_dict('records')
+def ticker_frame(df, ticker):
+    """Slice one ticker out of a (possibly single-ticker) grouped yf.download frame"""
+    return df[ticker] if isinstance(df.columns, pd.MultiIndex) else df
+
+def cached_info(ticker):
+    """The INFO_FIELDS of yfinance .info for a ticker, read from INFO_CACHE_DIR while under INFO_TTL old"""
+    path = os.path.join(INFO_CACHE_DIR, f"{ticker}.json")
+    try:
+        if time.time() - os.path.getmtime(path) < INFO_TTL:
+            return read_json(path)
+    except (OSError, ValueError):
+        pass
+
+    info = with_retries(lambda: yf.Ticker(ticker).info)
+    info = {k: info[k] for k in INFO_FIELDS if info.get(k) is not None}
+    try:
+        os.makedirs(INFO_CACHE_DIR, exist_ok=True)
+        write_json(path, info)
+    except OSError as e:
+        log_error(ticker, f"Failed to cache info: {e}")
+    return info
+
+def fetch_fundamentals(ticker, hist):
+    """Fetch fundamentals for a ticker whose price history is already downloaded"""
+    try:
+        # Column arrays (float32 prices, tz-naive dates) instead of per-bar Python objects
+        hist_data = {"Date": hist.index.tz_localize(None).to_numpy()}
+        for col in ['Open', 'High', 'Low', 'Close']:
+            hist_data[col] = hist[col].to_numpy(dtype=np.float32)
+        hist_data['Volume'] = hist['Volume'].to_numpy()
 
         # Fundamentals
-        info = stock.info
+        info = cached_info(ticker)
         fundamentals = {
             "eps_growth": info.get("earningsQuarterlyGrowth", None),
             "roe": info.get("returnOnEquity", None),
             "market_cap": info.get("marketCap", None),
             "sector": info.get("sector", "Unknown"),
             "pe_ratio": info.get("trailingPE", None),
-            "price": info.get("currentPrice") or hist['Close'].iloc[-1],
+            "price": float(hist_data['Close'][-1]),
             "fiftyTwoWeekHigh": info.get("fiftyTwoWeekHigh", None),
-            "twoHundredDayAverage": info.get("twoHundredDayAverage", None)
+            "twoHundredDayAverage": info.get("twoHundredDayAverage", None),
+            # Trailing levels from our own bars, so readers never re-roll the history
+            "sma200": float(hist_data['Close'][-200:].mean(dtype=np.float64)) if len(hist) >= 200 else None,
+            "high52": float(hist_data['High'][-252:].max())
         }
 
-        # Validate hist is list of dicts
-        if not isinstance(hist_data, list) or not all(isinstance(d, dict) for d in hist_data):
-            log_error(ticker, "Invalid hist format after conversion")
-            return None
-
         return {
             "hist": hist_data,
             "fundamentals": fundamentals
         }
     except Exception as e:
+        if is_missing(e):
+            mark_missing(ticker)
         log_error(ticker, f"Error fetching data: {e}")
         return None
 
+def fetch_single_stock(ticker):
+    """Fetch historical and fundamental data for a single ticker"""
+    try:
+        # raise_errors surfaces delisted tickers as YFTickerMissingError instead of an empty frame
+        hist = with_retries(yf.Ticker(ticker).history, period="2y", raise_errors=True)
+        if hist.empty:
+            log_error(ticker, "Empty history from yfinance")
+            return None
+        return fetch_fundamentals(ticker, hist)
+    except Exception as e:
+        if is_missing(e):
+            mark_missing(ticker)
+        log_error(ticker, f"Error fetching data: {e}")
+        return None
+
+def download_histories(tickers, start=None):
+    """Download daily bars (2y, or from `start` on) for several tickers in one request
+
+    Returns ({ticker: frame}, throttled) as download_frames does.
+    """
+    span = {"start": start} if start is not None else {"period": "2y"}
+    frames, throttled = download_frames(tickers, **span, group_by="ticker", auto_adjust=True, threads=True, progress=False)
+    hists = {}
+    for ticker, frame in frames.items():
+        hist = frame.dropna(subset=['Close'])
+        if not hist.empty:
+            hists[ticker] = hist
+    return hists, throttled
+
+def load_stored_histories():
+    """Bars already in the Parquet store as {ticker: frame indexed by Date}"""
+    if not os.path.exists(HIST_FILE):
+        return {}
+    try:
+        hist_df = pd.read_parquet(HIST_FILE)
+    except Exception as e:
+        log_error("N/A", f"Failed to read {HIST_FILE}, doing a full fetch: {e}")
+        return {}
+    return {t: g.droplevel('ticker') for t, g in hist_df.groupby(level='ticker', observed=True)}
+
+def merge_history(old, new):
+    """Append new bars to stored ones, keeping 2y; None if the overlap was re-adjusted (split/dividend)"""
+    overlap = new.index.intersection(old.index)
+    if len(overlap) and not np.allclose(old.loc[overlap, 'Close'], new.loc[overlap, 'Close'], rtol=1e-3):
+        return None
+    merged = pd.concat([old[~old.index.isin(new.index)], new]).sort_index()
+    return merged[merged.index >= merged.index[-1] - pd.DateOffset(years=2)]
+
+def download_batch(batch, stored):
+    """Batched bar downloads for one batch: deltas for stored tickers, 2y for new ones
+
+    Returns (hists, throttled): tickers Yahoo kept rate-limiting are in `throttled`
+    rather than left to the per-ticker fallback, which would only add load.
+    """
+    hists = {}
+    throttled = []
+    known = [t for t in batch if t in stored]
+    new = [t for t in batch if t not in stored]
+    # Stored tickers only need the bars since their last date; anything still missing falls back per ticker
+    try:
+        if known:
+            start = min(stored[t].index[-1] for t in known)
+            deltas, throttled = download_histories(known, start=start)
+            for ticker, delta in deltas.items():
+                merged = merge_history(stored[ticker], delta)
+                if merged is None:
+                    new.append(ticker)
+                else:
+                    hists[ticker] = merged
+        # New and re-adjusted tickers share one full-history download
+        if new:
+            full, full_throttled = download_histories(new)
+            hists.update(full)
+            throttled += full_throttled
+    except Exception as e:
+        log_error("N/A", f"Batched history download failed, fetching per ticker: {e}")
+    return hists, throttled
+
 def fetch_stock_data(max_tickers=None, batch_size=50):
-    """Fetch data for all tickers in batches with delay"""
+    """Fetch data for all tickers: batched bar downloads feeding one pool of fundamentals fetches"""
     ensure_data_file()
 
     tickers = load_tickers()
     if max_tickers:
         tickers = tickers[:max_tickers]
+    tickers = [t for t in tickers if not known_missing(t)]
 
     total = len(tickers)
-    results = {}
-
-    for i in range(0, total, batch_size):
-        batch = tickers[i:i+batch_size]
-        print(f"Processing batch {i//batch_size + 1}")
-        for ticker in batch:
-            try:
-                data = fetch_single_stock(ticker)
-                if data:
-                    results[ticker] = data
-                time.sleep(0.1)  # Rate limit delay
-            except Exception as e:
-                log_error(ticker, str(e))
-                continue
-
-    # Save to file
+    stored = load_stored_histories()
+    futures = {}
+
+    # One pool for the whole run, so the next batch downloads while the last one's
+    # .info calls are still in flight; the pool size caps requests in flight
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as pool:
+        for i in range(0, total, batch_size):
+            batch = tickers[i:i+batch_size]
+            print(f"Processing batch {i//batch_size + 1}")
+            hists, throttled = download_batch(batch, stored)
+            if throttled:
+                # Still rate-limited after backing off: keep stored bars rather than asking again per ticker
+                log_error("N/A", f"Rate-limited by Yahoo, not refreshed: {', '.join(throttled)}")
+                hists.update({t: stored[t] for t in throttled if t in stored})
+            for t in batch:
+                if t in hists:
+                    futures[t] = pool.submit(fetch_fundamentals, t, hists[t])
+                elif t not in throttled:
+                    futures[t] = pool.submit(fetch_single_stock, t)
+    results = {t: r for t, f in futures.items() if (r := f.result())}
+
+    # Save to file: bars go to Parquet, the JSON keeps only a small index of fundamentals
     try:
-        with open(DATA_FILE, 'r') as f:
-            file_data = json.load(f)
-        file_data['stocks'] = results
+        save_parquet_store(results)
+        file_data = read_json(DATA_FILE)
+        file_data['stocks'] = {t: {"fundamentals": d["fundamentals"]} for t, d in results.items()}
         file_data['last_fetch'] = datetime.now(IST).isoformat()
-        with open(DATA_FILE, 'w') as f:
-            json.dump(file_data, f, indent=2)
+        write_json(DATA_FILE, file_data)
     except Exception as e:
         log_error("N/A", f"Failed to save stock_data.json: {e}")
 
     return results
 
-def calculate_score(data):
-    """Calculate CAN SLIM score (fundamental + technical)"""
+def save_parquet_store(stocks):
+    """Write history (indexed by ticker, Date) and fundamentals to Parquet"""
+    columns = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+    # Fetched hist is already column arrays; only older row-oriented JSON needs a frame to pivot it
+    hists = {t: d['hist'] if isinstance(d['hist'], dict) else pd.DataFrame(d['hist']).to_dict('list')
+             for t, d in stocks.items()}
+    # One concatenate per column instead of a frame per ticker plus a concat of them all
+    data = {col: np.concatenate([np.asarray(h[col]) for h in hists.values()]) if hists else np.array([])
+            for col in columns}
+    lengths = [len(h['Date']) for h in hists.values()]
+    index = pd.MultiIndex.from_arrays(
+        [np.repeat(np.array(list(hists), dtype=object), lengths), pd.to_datetime(data.pop('Date'), format='%Y-%m-%d')],
+        names=['ticker', 'Date']
+    )
+    # float32 is plenty for prices and halves the bytes scanned downstream
+    hist_df = pd.DataFrame(data, index=index).astype(
+        {'Open': 'float32', 'High': 'float32', 'Low': 'float32', 'Close': 'float32'})
+    hist_df.sort_index().to_parquet(HIST_FILE, compression='zstd')
+
+    fund_df = pd.DataFrame.from_dict({t: d['fundamentals'] for t, d in stocks.items()}, orient='index')
+    fund_df.index.name = 'ticker'
+    num_cols = fund_df.columns.drop('sector', errors='ignore')
+    fund_df[num_cols] = fund_df[num_cols].apply(pd.to_numeric, errors='coerce').astype('float32')
+    if 'sector' in fund_df:
+        fund_df['sector'] = fund_df['sector'].astype('category')
+    fund_df.to_parquet(FUNDAMENTALS_FILE, compression='zstd')
+
+def migrate_json_to_parquet():
+    """Convert a stock_data.json that still embeds price history into the Parquet store"""
+    try:
+        stocks = read_json(DATA_FILE).get('stocks', {})
+        if any('hist' not in d for d in stocks.values()):
+            log_error("N/A", "stock_data.json has no price history to migrate; refresh the data")
+            return
+        save_parquet_store(stocks)
+    except Exception as e:
+        log_error("N/A", f"Failed to migrate stock_data.json to Parquet: {e}")
+
+def load_parquet_store():
+    """Load (hist_df, fund_df) from the Parquet store"""
+    return pd.read_parquet(HIST_FILE), pd.read_parquet(FUNDAMENTALS_FILE)
+
+def fetch_latest_prices(tickers):
+    """Fetch the latest close for several tickers with one batched download"""
+    prices = {}
+    if not tickers:
+        return prices
+    try:
+        frames, throttled = download_frames(tickers, period="1d", group_by="ticker", threads=True, progress=False)
+    except Exception as e:
+        log_error("N/A", f"Batched price download failed: {e}")
+        return prices
+    if throttled:
+        log_error("N/A", f"Rate-limited by Yahoo, no live price for: {', '.join(throttled)}")
+
+    for ticker, frame in frames.items():
+        try:
+            prices[ticker] = float(frame['Close'].dropna().iloc[-1])
+        except Exception as e:
+            log_error(ticker, f"No latest price in batched download: {e}")
+    return prices
+
+def fundamental_scores(fund_df):
+    """Score the fundamentals (EPS growth, ROE, size) of every row of fund_df at once"""
+    cols = fund_df.reindex(columns=['eps_growth', 'roe', 'market_cap'])
+    eps, roe, cap = (cols[c].to_numpy(dtype=np.float64, na_value=np.nan) for c in cols)
+    # NaN compares False, so missing fields score nothing, as before
+    score = (
+        np.where(eps > 0.25, 40, 0)
+        + np.where(roe > 0.17, 30, 0)
+        + np.select([cap > 10e9, cap > 2e9], [10, 5], 0)
+    )
+    return pd.Series(score, index=fund_df.index)
+
+# nogil lets the app's scoring threads run the kernel in parallel
+@njit(cache=True, nogil=True)
+def _score_kernel(close):
+    """Single pass over closes returning (rsi_last, rsi_prev, macd_last, macds_last, sma200_last)
+
+    RSI(14) uses pandas_ta's adjusted Wilder average; MACD(12, 26, 9) uses EMAs
+    seeded with the SMA of their first window, as pandas_ta does.
+    """
+    n = close.shape[0]
+    a_rsi = 1.0 / 14
+    a_fast = 2.0 / 13
+    a_slow = 2.0 / 27
+    a_sig = 2.0 / 10
+    gain = loss = 0.0
+    fast = slow = 0.0
+    sum_fast = sum_slow = sum_sig = sum_200 = 0.0
+    rsi_last = rsi_prev = macd = np.nan
+    macds = np.nan
+
+    prev = 0.0
+    for i in range(n):
+        # Stored closes may be float32; accumulate in float64 either way
+        c = np.float64(close[i])
+        if i > 0:
+            d = c - prev
+            gain = gain * (1 - a_rsi) + max(d, 0.0)
+            loss = loss * (1 - a_rsi) + max(-d, 0.0)
+            if i >= 14:
+                rsi_prev = rsi_last
+                rsi_last = 100.0 * gain / (gain + loss) if gain + loss > 0 else np.nan
+
+        if i < 12:
+            sum_fast += c
+            fast = sum_fast / 12
+        else:
+            fast = a_fast * c + (1 - a_fast) * fast
+        if i < 26:
+            sum_slow += c
+            slow = sum_slow / 26
+        else:
+            slow = a_slow * c + (1 - a_slow) * slow
+
+        if i >= 25:
+            macd = fast - slow
+            k = i - 25
+            if k < 9:
+                sum_sig += macd
+                if k == 8:
+                    macds = sum_sig / 9
+            else:
+                macds = a_sig * macd + (1 - a_sig) * macds
+
+        if i >= n - 200:
+            sum_200 += c
+        prev = c
+
+    return rsi_last, rsi_prev, macd, macds, sum_200 / min(n, 200)
+
+# Compile (or load from the numba cache) once at import, not inside the first scoring threads
+_score_kernel(np.linspace(1.0, 2.0, 300))
+_score_kernel(np.linspace(1.0, 2.0, 300, dtype=np.float32))
+
+def technical_score(data):
+    """Score the price action of a ticker, or None if it has under 200 bars of history"""
     try:
         fund = data['fundamentals']
-        hist_df = pd.DataFrame(data['hist'])
-        if len(hist_df) < 200:
-            return 0, 0, 0
-
-        # Technical indicators
-        hist_df['rsi'] = ta.rsi(hist_df['Close'], length=14)
-        macd = ta.macd(hist_df['Close'])
-        hist_df = pd.concat([hist_df, macd], axis=1)
-        hist_df['sma_200'] = hist_df['Close'].rolling(200).mean()
-
-        latest = hist_df.iloc[-1]
-        prev = hist_df.iloc[-2]
-
-        # Fundamental score
-        f_score = 0
-        if fund.get("eps_growth", 0) and fund["eps_growth"] > 0.25:
-            f_score += 40
-        if fund.get("roe", 0) and fund["roe"] > 0.17:
-            f_score += 30
-        if fund.get("market_cap", 0):
-            if fund["market_cap"] > 10e9:
-                f_score += 10
-            elif fund["market_cap"] > 2e9:
-                f_score += 5
-
-        # Technical score
+        # float32 arrays from the store go to the kernel as-is, without a float64 copy
+        close = np.asarray(data['hist']['Close'])
+        if close.dtype not in (np.float32, np.float64):
+            close = close.astype(np.float64)
+        if len(close) < 200:
+            return None
+
+        rsi, rsi_prev, macd, macds, sma_200 = _score_kernel(close)
+
         t_score = 0
-        if latest['rsi'] < 70 and prev['rsi'] < 70 and latest['rsi'] > prev['rsi']:
+        if rsi < 70 and rsi_prev < 70 and rsi > rsi_prev:
             t_score += 20
-        if 'MACD_12_26_9' in latest and 'MACDs_12_26_9' in latest:
-            if latest['MACD_12_26_9'] > latest['MACDs_12_26_9']:
-                t_score += 20
-        if latest['Close'] > latest['sma_200']:
+        if macd > macds:
+            t_score += 20
+        if close[-1] > sma_200:
             t_score += 20
-        if fund.get("fiftyTwoWeekHigh") and fund.get("price"):
-            if fund["price"] >= 0.95 * fund["fiftyTwoWeekHigh"]:
+        high_52 = fund.get("high52") or fund.get("fiftyTwoWeekHigh")
+        if high_52 and fund.get("price"):
+            if fund["price"] >= 0.95 * high_52:
                 t_score += 20
-
-        total_score = f_score + t_score
-        return total_score, f_score, t_score
+        return t_score
     except Exception as e:
-        log_error("N/A", f"Error in calculate_score: {e}")
-        return 0, 0, 0
+        log_error("N/A", f"Error in technical_score: {e}")
+        return None
 
-# === Backtesting ===
+def _rolling_mean(a, window):
+    """Trailing mean over `window` bars from one cumulative sum; NaN until the window fills"""
+    out = np.full(len(a), np.nan)
+    if len(a) >= window:
+        csum = np.concatenate(([0.0], np.cumsum(a, dtype=np.float64)))
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+@njit(cache=True)
+def _rolling_max(a, window):
+    """Trailing max over `window` bars with a monotonic deque, O(N) overall; NaN until the window fills"""
+    n = a.shape[0]
+    out = np.full(n, np.nan)
+    dq = np.empty(n, dtype=np.int64)
+    head = 0
+    tail = 0
+    for i in range(n):
+        while tail > head and a[dq[tail - 1]] <= a[i]:
+            tail -= 1
+        dq[tail] = i
+        tail += 1
+        if dq[head] <= i - window:
+            head += 1
+        if i >= window - 1:
+            out[i] = a[dq[head]]
+    return out
 
-class CANSLIMStrategy(bt.Strategy):
-    params = (
-        ('stop_loss_percent', 0.07),
-        ('trail_percent', 0.10),
-    )
+def calculate_score(data):
+    """Calculate CAN SLIM score (fundamental + technical)"""
+    t_score = technical_score(data)
+    if t_score is None:
+        return 0, 0, 0
+    f_score = int(fundamental_scores(pd.DataFrame([data['fundamentals']])).iloc[0])
+    return f_score + t_score, f_score, t_score
 
-    def __init__(self):
-        self.data_close = self.datas[0].close
-        self.sma_200 = bt.indicators.SMA(self.data_close, period=200)
-        self.highest_high = bt.indicators.Highest(self.data_close, period=252)
-        self.order = None
-        self.buy_price = None
-
-    def notify_order(self, order):
-        if order.status in [order.Completed]:
-            if order.isbuy():
-                self.buy_price = order.executed.price
-            self.order = None
-
-    def next(self):
-        if self.order:
-            return
+# === Backtesting ===
 
-        if not self.position:
-            if self.data_close[0] > self.sma_200[0] and self.data_close[0] >= self.highest_high[0]:
-                self.buy()
+@njit(cache=True)
+def _canslim_equity(open_, close, sma200, high252, stop_mult, trail_mult, cash, commission):
+    """Daily account value and trades under the CAN SLIM rules: signals on the close, one-share fills at the next open"""
+    n = close.shape[0]
+    values = np.empty(n)
+    # One row per trade: (entry bar, entry price, exit bar, exit price); exit bar -1 while still open
+    trades = np.empty((n, 4))
+    n_trades = 0
+    shares = 0
+    pending = 0  # +1 buy / -1 sell, filled at this bar's open
+    buy_price = 0.0
+    highest = 0.0
+    for i in range(n):
+        if pending == 1:
+            buy_price = highest = open_[i]
+            cash -= buy_price * (1 + commission)
+            shares += 1
+            trades[n_trades, 0] = i
+            trades[n_trades, 1] = buy_price
+            trades[n_trades, 2] = -1
+            trades[n_trades, 3] = np.nan
+            n_trades += 1
+        elif pending == -1:
+            cash += open_[i] * (1 - commission)
+            shares -= 1
+            trades[n_trades - 1, 2] = i
+            trades[n_trades - 1, 3] = open_[i]
+        pending = 0
+
+        c = close[i]
+        if shares == 0:
+            # Breakout: above the 200-day SMA and at a new 252-day closing high
+            if c > sma200[i] and c >= high252[i]:
+                pending = 1
         else:
-            if self.data_close[0] <= self.buy_price * (1 - self.p.stop_loss_percent):
-                self.sell()
-            elif self.data_close[0] <= self.data_close[0] * (1 - self.p.trail_percent):
-                self.sell()
-
-def run_backtest(ticker, data):
-    """Run backtest using backtrader and return metrics"""
+            highest = max(highest, c)
+            if c <= buy_price * stop_mult or c <= highest * trail_mult:
+                pending = -1
+        values[i] = cash + shares * c
+    return values, trades[:n_trades]
+
+def run_backtest(ticker, data, params=None):
+    """Backtest the CAN SLIM rules on one ticker and return metrics; `params` overrides STRATEGY_PARAMS"""
     try:
-        df = pd.DataFrame(data['hist'])
-        df['datetime'] = pd.to_datetime(df['Date'])
-        df.set_index('datetime', inplace=True)
-        df = df[['Open', 'High', 'Low', 'Close', 'Volume']]
-
-        if len(df) < 252:
+        hist = data['hist']
+        close = np.asarray(hist['Close'], dtype=np.float64)
+        if len(close) < 252:
             return None
 
-        data_feed = bt.feeds.PandasData(dataname=df)
-        cerebro = bt.Cerebro()
-        cerebro.adddata(data_feed)
-        cerebro.addstrategy(CANSLIMStrategy)
-        cerebro.broker.set_cash(100000.0)
-        cerebro.broker.setcommission(commission=0.001)
-
-        initial_value = cerebro.broker.getvalue()
-        results = cerebro.run()
-        final_value = cerebro.broker.getvalue()
-
-        cagr = ((final_value / initial_value) ** (252/len(df))) - 1
-        pnl = cerebro.analyzers.getbyname('pnl')
-        returns = [x for x in cerebro.runstrats[0].strat.analyzers.pnl.get_analysis().values()]
-        sharpe = bt.analyzers.SharpeRatio()
-        max_drawdown = bt.analyzers.DrawDown()
-
-        sharpe_ratio = results[0].analyzers.sharperatio.get_analysis()['sharperatio']
-        drawdown = results[0].analyzers.drawdown.get_analysis()['max']['drawdown']
+        p = {**STRATEGY_PARAMS, **(params or {})}
+        values, _ = _canslim_equity(
+            np.asarray(hist['Open'], dtype=np.float64), close,
+            _rolling_mean(close, 200), _rolling_max(close, 252),
+            1 - p['stop_loss_percent'], 1 - p['trail_percent'],
+            BACKTEST_CASH, BACKTEST_COMMISSION
+        )
+
+        cagr = ((values[-1] / BACKTEST_CASH) ** (252/len(values))) - 1
+        # Annualised Sharpe of daily returns (zero risk-free rate, population std); None when flat
+        returns = np.diff(values, prepend=BACKTEST_CASH) / np.concatenate(([BACKTEST_CASH], values[:-1]))
+        std = returns.std()
+        sharpe_ratio = np.sqrt(252) * returns.mean() / std if std > 0 else None
+        peak = np.maximum.accumulate(values)
+        drawdown = 100 * ((peak - values) / peak).max()
 
         return {
             'CAGR': round(cagr * 100, 2),
-            'Sharpe Ratio': round(sharpe_ratio, 2),
+            'Sharpe Ratio': round(sharpe_ratio, 2) if sharpe_ratio is not None else None,
             'Max Drawdown': round(drawdown, 2)
         }
     except Exception as e:
         log_error(ticker, f"Backtest failed: {e}")
         return None
+
+def run_backtests(stocks, params=None):
+    """Backtest {ticker: data}, returning {ticker: metrics} for successes"""
+    # Each run is a compiled loop over a few hundred bars; worker processes would cost more than they save
+    metrics = {ticker: run_backtest(ticker, data, params) for ticker, data in stocks.items()}
+    return {ticker: m for ticker, m in metrics.items() if m}